@@ -1,23 +1,58 @@
 #!/usr/bin/env python3
 import os
 import ast
+import functools
+import hashlib
+import io
 import logging
-from typing import Dict, Set, List, Tuple, Optional
+import pickle
+import re
+import string
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, Set, List, Tuple, Optional, Union
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+try:
+    from mypy_extensions import mypyc_attr
+except ImportError:  # only needed when compiling with mypyc (see setup.py)
+    def mypyc_attr(*attrs: str, **kwattrs: object) -> Any:  # type: ignore[misc]
+        return lambda cls: cls
+
+try:
+    # mypyc resolves pickle.Unpickler (subclassed below) to _pickle.Unpickler
+    # and only compiles if that module is imported too
+    import _pickle  # noqa: F401
+except ImportError:  # not CPython
+    pass
 
 
 logging.basicConfig(level=logging.INFO)
 
+FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+FUNCTION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+FunctionEntry = Tuple[str, Optional[str]]  # (file_path, class_name or None)
+FileExtract = Tuple[Dict[str, FunctionEntry], "FunctionDetails", Dict[str, str], Dict[str, Tuple[Optional[str], str]]]
+ParseResult = Tuple[str, Optional[FileExtract], Optional[str]]  # (module, extracted, error)
+
 # ---------- Helpers for parsing ----------
-def get_arg_type(arg) -> str:
+def get_annotation_source(annotation: ast.expr, source_lines: List[bytes]) -> str:
+    # Slice single-line annotations straight out of the source (col offsets are
+    # utf-8 byte offsets); multi-line ones are unparsed to keep them on one line.
+    lineno, end_lineno = annotation.lineno, annotation.end_lineno
+    if lineno == end_lineno and annotation.end_col_offset is not None:
+        return source_lines[lineno - 1][annotation.col_offset:annotation.end_col_offset].decode("utf-8")
+    return ast.unparse(annotation) if hasattr(ast, "unparse") else ast.dump(annotation)
+
+def get_arg_type(arg: ast.arg, source_lines: List[bytes]) -> str:
     if arg.annotation is not None:
-        return ast.unparse(arg.annotation) if hasattr(ast, "unparse") else ast.dump(arg.annotation)
+        return get_annotation_source(arg.annotation, source_lines)
     return "Any"
 
-def get_return_type(node) -> str:
+def get_return_type(node: FunctionNode, source_lines: List[bytes]) -> str:
     if node.returns is not None:
-        return ast.unparse(node.returns) if hasattr(ast, "unparse") else ast.dump(node.returns)
+        return get_annotation_source(node.returns, source_lines)
     return "Any"
 
 def get_module_name(file_path: str, root: str) -> str:
@@ -27,114 +62,373 @@ def get_module_name(file_path: str, root: str) -> str:
         parts[-1] = parts[-1][:-3]
     if parts[-1] == '__init__':
         parts = parts[:-1]
-    return ".".join(parts)
+    return sys.intern(".".join(parts))
+
+# ---------- Extract cache ----------
+
+# Each file's extract (functions, details, imports) is pickled under
+# ~/.cache/pymap so unchanged files skip both ast.parse and extraction.
+# Size policy: there is one entry per analysed (file, module) pair, replaced
+# in place whenever the file's sha256 changes, so the cache grows with the
+# number of distinct files analysed, not with the number of edits. Entries of
+# deleted or moved files are never reclaimed; remove the directory to reset it.
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pymap")
+CACHE_FORMAT = 1  # bump whenever the layout of a cache entry changes
+cache_stats = {"hits": 0, "misses": 0}
+
+@mypyc_attr(native_class=False)
+class BuiltinsOnlyUnpickler(pickle.Unpickler):
+    # Entries only ever hold str/int/None/tuple/list/dict, so refuse any class
+    def find_class(self, module: str, name: str) -> Any:
+        raise pickle.UnpicklingError(f"unexpected global {module}.{name} in cache entry")
+
+def get_cache_path(file_path: str, module: str) -> str:
+    key = hashlib.sha256(f"{file_path}\0{module}".encode("utf-8", "surrogateescape")).hexdigest()
+    py_version = "".join(str(v) for v in sys.version_info[:2])
+    return os.path.join(CACHE_DIR, f"{key}-py{py_version}.pkl")
+
+def load_cached_extract(file_path: str, module: str, source_hash: str) -> Optional["FileExtract"]:
+    try:
+        with open(get_cache_path(file_path, module), "rb") as f:
+            entry = BuiltinsOnlyUnpickler(io.BytesIO(f.read())).load()
+    except Exception:  # missing, truncated or corrupt entries are just misses
+        return None
+    if not (type(entry) is tuple and len(entry) == 6 and entry[0] == CACHE_FORMAT and entry[1] == source_hash):
+        return None
+    _, _, functions, columns, imports, symbols = entry
+    if not (type(functions) is dict and type(columns) is tuple and len(columns) == 4
+            and all(type(column) is list for column in columns) and type(imports) is dict and type(symbols) is dict):
+        return None
+    details = FunctionDetails()
+    for qname, args, return_type, raw_calls in zip(*columns):
+        details.add(qname, args, return_type, raw_calls)
+    cache_stats["hits"] += 1
+    return functions, details, imports, symbols
+
+def store_cached_extract(file_path: str, module: str, source_hash: str, extract: "FileExtract") -> None:
+    functions, details, imports, symbols = extract
+    columns = (details.qnames, details.args, details.returns, details.raw_calls)
+    cache_path = get_cache_path(file_path, module)
+    try:
+        data = pickle.dumps((CACHE_FORMAT, source_hash, functions, columns, imports, symbols), protocol=5)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pickle.PicklingError, RecursionError) as e:
+        # the extract itself is still fine to use
+        logging.debug(f"Could not write cache entry for {file_path}: {e}")
 
 # ---------- Main Analysis Passes ----------
 
-def collect_functions_and_imports(py_files: List[str], root: str):
+class FunctionDetails:
+    """
+    Per-function details stored as parallel lists (struct of arrays) rather than
+    one small dict per function. qname_to_idx maps a qualified name to its slot.
+    """
+    def __init__(self) -> None:
+        self.qname_to_idx: Dict[str, int] = {}
+        self.qnames: List[str] = []
+        self.args: List[List[Tuple[str, str]]] = []
+        self.returns: List[str] = []
+        self.raw_calls: List[List[str]] = []      # names called, resolved lazily by iter_call_graph
+
+    def __len__(self) -> int:
+        return len(self.qnames)
+
+    def add(self, qname: str, args: List[Tuple[str, str]], return_type: str, raw_calls: List[str]) -> int:
+        """Adds a function, replacing any earlier definition with the same name. Returns its slot."""
+        idx = self.qname_to_idx.get(qname)
+        if idx is None:
+            idx = len(self.qnames)
+            self.qname_to_idx[qname] = idx
+            self.qnames.append(qname)
+            self.args.append(args)
+            self.returns.append(return_type)
+            self.raw_calls.append(raw_calls)
+        else:
+            self.args[idx] = args
+            self.returns[idx] = return_type
+            self.raw_calls[idx] = raw_calls
+        return idx
+
+    def update(self, other: "FunctionDetails") -> None:
+        for i in range(len(other)):
+            self.add(sys.intern(other.qnames[i]), other.args[i], other.returns[i], other.raw_calls[i])
+
+    def sorted_indices(self) -> List[int]:
+        """Slots in qualified-name order."""
+        qname_to_idx = self.qname_to_idx
+        return [qname_to_idx[qname] for qname in sorted(qname_to_idx)]
+
+def get_call_names(node: FunctionNode) -> List[str]:
+    """
+    Names called anywhere inside a function (decorators, defaults and nested
+    defs included). Walks an explicit stack over node._fields rather than
+    ast.walk, and compares exact types instead of isinstance.
+    """
+    calls: List[str] = []
+    stack: List[ast.AST] = [node]
+    while stack:
+        current = stack.pop()
+        if type(current) is ast.Call:
+            func = current.func
+            # Normal function call: foo()
+            if type(func) is ast.Name:
+                calls.append(func.id)
+            # Method call: self.bar(), cls.bar()
+            elif type(func) is ast.Attribute and type(func.value) is ast.Name:
+                calls.append(func.attr)
+        for field in current._fields:
+            child = getattr(current, field, None)
+            if type(child) is list:
+                # lists may also hold None (dict keys) or str (global names)
+                stack.extend([c for c in child if isinstance(c, ast.AST)])
+            elif isinstance(child, ast.AST):
+                stack.append(child)
+    return calls
+
+@mypyc_attr(native_class=False)
+class ProjectVisitor(ast.NodeVisitor):
+    """
+    Single pass over one module's AST. Records top-level functions and class
+    methods, module-scope imports, and the raw names called inside each function
+    (collected with get_call_names).
+    """
+    def __init__(self, module: str, file_path: str, source_lines: List[bytes], all_functions: Dict[str, FunctionEntry],
+                 function_details: FunctionDetails, module_imports: Dict[str, Dict[str, str]],
+                 symbol_imports: Dict[str, Dict[str, Tuple[Optional[str], str]]]) -> None:
+        self.module = module
+        self.file_path = file_path
+        self.source_lines = source_lines
+        self.all_functions = all_functions
+        self.function_details = function_details
+        self.imports = module_imports.setdefault(module, {})
+        self.symbol_imports = symbol_imports.setdefault(module, {})
+
+    def visit_Module(self, node: ast.Module) -> None:
+        # One dict lookup on the exact node type instead of a chain of isinstance checks
+        handlers = TOP_LEVEL_HANDLERS
+        for stmt in node.body:
+            handler = handlers.get(type(stmt))
+            if handler is not None:
+                handler(self, stmt)
+
+    # functions
+    def _on_function(self, node: FunctionNode) -> None:
+        self._visit_function(node, None)
+
+    def _on_class(self, node: ast.ClassDef) -> None:
+        for item in node.body:
+            if isinstance(item, FUNCTION_TYPES):
+                self._visit_function(item, node.name)
+
+    # imports
+    def _on_import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self.imports[alias.asname or alias.name] = alias.name
+
+    def _on_import_from(self, node: ast.ImportFrom) -> None:
+        mod = node.module
+        for alias in node.names:
+            # from X import Y as Z => local name: Z or Y, from_module: X
+            local = alias.asname or alias.name
+            self.symbol_imports[local] = (mod, alias.name)
+
+    def _visit_function(self, node: FunctionNode, class_name: Optional[str]) -> None:
+        if class_name:
+            qname = sys.intern(f"{self.module}.{class_name}.{node.name}")
+        else:
+            qname = sys.intern(f"{self.module}.{node.name}")
+        self.all_functions[qname] = (self.file_path, class_name)
+        self.function_details.add(
+            qname,
+            [(arg.arg, get_arg_type(arg, self.source_lines)) for arg in node.args.args],
+            get_return_type(node, self.source_lines),
+            get_call_names(node),
+        )
+
+# Built after the class: mypyc does not allow a class body to refer to its own methods
+TOP_LEVEL_HANDLERS: Dict[type, Callable[[ProjectVisitor, Any], None]] = {
+    ast.FunctionDef: ProjectVisitor._on_function,
+    ast.AsyncFunctionDef: ProjectVisitor._on_function,
+    ast.ClassDef: ProjectVisitor._on_class,
+    ast.Import: ProjectVisitor._on_import,
+    ast.ImportFrom: ProjectVisitor._on_import_from,
+}
+
+def extract_module(tree: ast.Module, module: str, file_path: str, source_bytes: bytes) -> FileExtract:
+    """
+    Runs ProjectVisitor over one parsed file.
+    Returns:
+        (functions, function_details, imports, symbol_imports) for that file only
+    """
+    functions: Dict[str, FunctionEntry] = {}
+    function_details = FunctionDetails()
+    module_imports: Dict[str, Dict[str, str]] = {}
+    symbol_imports: Dict[str, Dict[str, Tuple[Optional[str], str]]] = {}
+    ProjectVisitor(module, file_path, source_bytes.splitlines(), functions, function_details, module_imports, symbol_imports).visit(tree)
+    return functions, function_details, module_imports[module], symbol_imports[module]
+
+def read_source(file_path: str) -> Tuple[Optional[bytes], Optional[str]]:
+    try:
+        with open(file_path, "rb") as f:
+            return f.read(), None
+    except OSError as e:
+        return None, str(e)
+
+def parse_file(file_path: str, source_bytes: bytes, module: str, use_cache: bool = True) -> ParseResult:
+    """
+    Worker for the process pool: parses and extracts one file, then stores the
+    extract in the cache.
+    Returns:
+        (module, extract_module results or None, error message or None)
+    """
+    try:
+        tree = ast.parse(source_bytes.decode("utf-8"), filename=file_path)
+        extract = extract_module(tree, module, file_path, source_bytes)
+    except Exception as e:
+        return module, None, f"Failed to parse {file_path}: {e}"
+    if use_cache:
+        store_cached_extract(file_path, module, hashlib.sha256(source_bytes).hexdigest(), extract)
+    return module, extract, None
+
+def collect_functions_and_imports(py_files: List[str], file_to_module: Dict[str, str], use_cache: bool = True, jobs: Optional[int] = None
+                                  ) -> Tuple[Dict[str, FunctionEntry], FunctionDetails, Dict[str, Dict[str, str]],
+                                             Dict[str, Dict[str, Tuple[Optional[str], str]]]]:
     """
+    Sources are read on a thread pool. Files whose extract is cached are taken
+    as is; the rest are parsed and extracted across a pool of `jobs` worker
+    processes (default: os.cpu_count()).
     Returns:
-        - all_functions: Dict[full_name, (file_path, FunctionDef/AsyncFunctionDef node, class_name or None)]
+        - all_functions: Dict[full_name, (file_path, class_name or None)]
+        - function_details: FunctionDetails with args/return and the raw names each function calls
         - module_imports: Dict[module, {alias: real_module}]
         - symbol_imports: Dict[module, {local_name: imported_from_module}]
     """
-    all_functions = dict()   # qualified_name -> (file, node, class_name/None)
-    module_imports = dict()  # module -> {alias: real_module}
-    symbol_imports = dict()  # module -> {local_name: from_module}
-    for file_path in py_files:
-        module = get_module_name(file_path, root)
+    results: Dict[int, ParseResult] = {}  # file index -> parse_file result
+    pending: List[int] = []                # indices of files that still need parsing
+    sources: List[bytes] = []
+    # Reads are issued on a thread pool so the I/O for later files overlaps
+    # with the cache lookups of earlier ones.
+    with ThreadPoolExecutor() as reader:
+        for i, (file_path, (source_bytes, read_error)) in enumerate(zip(py_files, reader.map(read_source, py_files))):
+            if source_bytes is None:
+                results[i] = (file_to_module[file_path], None, f"Failed to parse {file_path}: {read_error}")
+                continue
+            module = file_to_module[file_path]
+            extract = load_cached_extract(file_path, module, hashlib.sha256(source_bytes).hexdigest()) if use_cache else None
+            if extract is not None:
+                results[i] = (module, extract, None)
+            else:
+                pending.append(i)
+                sources.append(source_bytes)
+    if use_cache:
+        cache_stats["misses"] += len(pending)
+
+    pending_files = [py_files[i] for i in pending]
+    pending_modules = [file_to_module[file_path] for file_path in pending_files]
+    worker = functools.partial(parse_file, use_cache=use_cache)
+    max_workers = jobs or os.cpu_count() or 1
+    if max_workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as ex:
+            parsed = list(ex.map(worker, pending_files, sources, pending_modules, chunksize=16))
+    else:
+        parsed = list(map(worker, pending_files, sources, pending_modules))
+    for i, result in zip(pending, parsed):
+        results[i] = result
+
+    all_functions: Dict[str, FunctionEntry] = {}           # qualified_name -> (file, class_name/None)
+    function_details = FunctionDetails()                   # qualified_name -> args/return/calls slots
+    module_imports: Dict[str, Dict[str, str]] = {}         # module -> {alias: real_module}
+    symbol_imports: Dict[str, Dict[str, Tuple[Optional[str], str]]] = {}  # module -> {local_name: from_module}
+    for i in range(len(py_files)):
+        module, extracted, error = results[i]
+        # Re-intern names that crossed the process boundary so every index shares one object
+        module = sys.intern(module)
         module_imports[module] = {}
         symbol_imports[module] = {}
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                source = f.read()
-            tree = ast.parse(source, filename=file_path)
-        except Exception as e:
-            logging.error(f"Failed to parse {file_path}: {e}")
+        if extracted is None:
+            logging.error(error)
             continue
-        for node in tree.body:
-            # functions
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                func_name = f"{module}.{node.name}"
-                all_functions[func_name] = (file_path, node, None)
-            elif isinstance(node, ast.ClassDef):
-                for item in node.body:
-                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                        func_name = f"{module}.{node.name}.{item.name}"
-                        all_functions[func_name] = (file_path, item, node.name)
-            # imports
-            elif isinstance(node, ast.Import):
-                for alias in node.names:
-                    module_imports[module][alias.asname or alias.name] = alias.name
-            elif isinstance(node, ast.ImportFrom):
-                mod = node.module
-                for alias in node.names:
-                    # from X import Y as Z => local name: Z or Y, from_module: X
-                    local = alias.asname or alias.name
-                    symbol_imports[module][local] = (mod, alias.name)
-    return all_functions, module_imports, symbol_imports
-
-def build_function_call_graph(py_files: List[str], root: str, all_functions: Dict, module_imports: Dict, symbol_imports: Dict):
+        functions, details, imports, symbols = extracted
+        for qname, entry in functions.items():
+            all_functions[sys.intern(qname)] = entry
+        function_details.update(details)
+        module_imports[module] = imports
+        symbol_imports[module] = symbols
+    return all_functions, function_details, module_imports, symbol_imports
+
+def build_symbol_index(all_functions: Dict[str, FunctionEntry]) -> Tuple[Dict[str, Set[str]], Dict[str, Dict[str, Set[str]]]]:
     """
     Returns:
-        function_details: Dict[qualified_name, Dict with arguments/types/return/calls]
+        - symbol_to_func: Dict[short_name, Set[qualified_name]]
+        - module_to_local_names: Dict[module, Dict[short_name, Set[qualified_name]]]
+          where every dotted prefix of a qualified name counts as its module
     """
-    # Reverse mapping: symbol -> qualified name (for cross-module calls)
-    symbol_to_func = {}
+    symbol_to_func: Dict[str, Set[str]] = {}                    # short name -> qualified names (for cross-module calls)
+    module_to_local_names: Dict[str, Dict[str, Set[str]]] = {}  # module prefix -> short name -> qualified names
     for qname in all_functions:
-        short = qname.split(".")[-1]
+        parts = qname.split(".")
+        short = parts[-1]
         symbol_to_func.setdefault(short, set()).add(qname)
+        for i in range(1, len(parts)):
+            prefix = ".".join(parts[:i])
+            module_to_local_names.setdefault(prefix, {}).setdefault(short, set()).add(qname)
+    return symbol_to_func, module_to_local_names
+
+def iter_call_graph(file_to_module: Dict[str, str], all_functions: Dict[str, FunctionEntry], function_details: FunctionDetails,
+                    module_imports: Dict[str, Dict[str, str]],
+                    symbol_imports: Dict[str, Dict[str, Tuple[Optional[str], str]]]) -> Iterator[Tuple[int, FrozenSet[str]]]:
+    """
+    Resolves the raw call names recorded by ProjectVisitor to project functions,
+    one function at a time in qualified-name order, so the output can be written
+    as it goes. Only the symbol index is needed up front; each function's raw
+    call names are released once it has been resolved.
+    Yields:
+        (function_details slot, frozenset of called qualified names)
+    """
+    symbol_to_func, module_to_local_names = build_symbol_index(all_functions)
+    # The same (module, name) pair is resolved once, however many call sites it has
+    resolve_cache: Dict[Tuple[str, str], Optional[Set[str]]] = {}
 
-    # Mapping: per function, all info
-    function_details = {}
-    for qname, (file_path, node, class_name) in all_functions.items():
-        # Arguments and return type
-        args = [(arg.arg, get_arg_type(arg)) for arg in node.args.args]
-        return_type = get_return_type(node)
+    for idx in function_details.sorted_indices():
+        file_path, class_name = all_functions[function_details.qnames[idx]]
         # Figure out module for resolving imports
-        module = get_module_name(file_path, root)
-        # Now collect called functions (names)
-        called = set()
-        for call_node in ast.walk(node):
-            if isinstance(call_node, ast.Call):
-                name = None
-                # Normal function call: foo()
-                if isinstance(call_node.func, ast.Name):
-                    name = call_node.func.id
-                # Method call: self.bar(), cls.bar()
-                elif isinstance(call_node.func, ast.Attribute):
-                    if isinstance(call_node.func.value, ast.Name):
-                        name = call_node.func.attr
-                if name:
-                    resolved = resolve_function_name(name, module, module_imports, symbol_imports, all_functions, symbol_to_func)
-                    # *** Only include if resolved to a project function ***
-                    if resolved and any(r in all_functions for r in resolved):
-                        called.update(r for r in resolved if r in all_functions)
-        function_details[qname] = {
-            "args": args,
-            "return": return_type,
-            "calls": called
-        }
-    return function_details
-
-def resolve_function_name(name, current_module, module_imports, symbol_imports, all_functions, symbol_to_func) -> Optional[Set[str]]:
+        module = file_to_module[file_path]
+        called: List[str] = []
+        # Each distinct name is resolved once per function, however often it is called
+        for name in set(function_details.raw_calls[idx]):
+            key = (module, name)
+            if key in resolve_cache:
+                resolved = resolve_cache[key]
+            else:
+                resolved = resolve_function_name(name, module, module_imports, symbol_imports, module_to_local_names, symbol_to_func)
+                resolve_cache[key] = resolved
+            # Resolution only returns names from the symbol index, i.e. project functions
+            if resolved:
+                called.extend(resolved)
+        function_details.raw_calls[idx] = []
+        yield idx, frozenset(called)
+
+def resolve_function_name(name: str, current_module: str, module_imports: Dict[str, Dict[str, str]],
+                          symbol_imports: Dict[str, Dict[str, Tuple[Optional[str], str]]],
+                          module_to_local_names: Dict[str, Dict[str, Set[str]]],
+                          symbol_to_func: Dict[str, Set[str]]) -> Optional[Set[str]]:
     """
     Try to resolve a function name (called in current_module) to its fully qualified name(s).
     - Checks: local, imported as symbol, imported module alias, global matches.
     """
     # 1. Check local (same module)
-    possible = set()
-    for candidate in all_functions:
-        if candidate.startswith(current_module + ".") and candidate.split(".")[-1] == name:
-            possible.add(candidate)
+    possible = module_to_local_names.get(current_module, {}).get(name)
     if possible:
         return possible
     # 2. Check symbol imports (from x import y)
     if name in symbol_imports.get(current_module, {}):
         from_mod, orig_name = symbol_imports[current_module][name]
-        target = f"{from_mod}.{orig_name}"
-        # Try to match in all_functions
-        resolved = {k for k in all_functions if k.endswith(f".{orig_name}") and k.startswith(from_mod or "")}
+        # Try to match among the project functions named orig_name
+        resolved = {k for k in symbol_to_func.get(orig_name, ()) if k.startswith(from_mod or "")}
         if resolved:
             return resolved
     # 3. Check if called via module alias: mod.foo()
@@ -146,60 +440,271 @@ def resolve_function_name(name, current_module, module_imports, symbol_imports,
 
 # ---------- Markdown Output ----------
 
-def write_markdown(root: str, function_details: Dict, all_functions: Dict):
-    lines = ["# Project-wide Function Mapping\n"]
-    lines.append("## Functions (with cross-file call analysis)\n")
-    for qname, details in sorted(function_details.items()):
-        args_str = ", ".join(f"{n}: {t}" for n, t in details["args"])
-        lines.append(f"### `{qname}({args_str}) -> {details['return']}`")
-        if details["calls"]:
-            calls_str = ", ".join(sorted(details["calls"]))
-            lines.append(f"- Calls: `{calls_str}`")
+def write_markdown(root: str, function_details: FunctionDetails, call_graph: Iterable[Tuple[int, FrozenSet[str]]], out_path: str) -> None:
+    # Streamed one function at a time, as call_graph resolves it, through a large write buffer
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write("# Project-wide Function Mapping\n\n")
+        f.write("## Functions (with cross-file call analysis)\n")
+        qnames = function_details.qnames
+        for i, calls in call_graph:
+            args_str = ", ".join(f"{n}: {t}" for n, t in function_details.args[i])
+            f.write(f"\n### `{qnames[i]}({args_str}) -> {function_details.returns[i]}`\n")
+            if calls:
+                calls_str = ", ".join(sorted(calls))
+                f.write(f"- Calls: `{calls_str}`\n")
+            else:
+                f.write("- Calls: None\n")
+        # Optionally: index all functions per file/module
+
+# ---------- .gitignore handling ----------
+
+DEFAULT_IGNORE_PATTERNS = [".git", "__pycache__/"]
+
+# [:name:] classes inside a bracket expression (ASCII, as in git's wildmatch)
+POSIX_CLASSES = {
+    "alnum": "a-zA-Z0-9", "alpha": "a-zA-Z", "blank": r" \t", "cntrl": r"\x00-\x1f\x7f",
+    "digit": "0-9", "graph": r"\x21-\x7e", "lower": "a-z", "print": r"\x20-\x7e",
+    "punct": re.escape(string.punctuation), "space": r" \t\n\r\f\v",
+    "upper": "A-Z", "xdigit": "0-9A-Fa-f",
+}
+
+def gitignore_bracket_to_regex(pattern: str, i: int) -> Tuple[Optional[str], int]:
+    """
+    Translates the bracket expression starting at pattern[i] == '[' member by member.
+    Returns:
+        (regex, index just past the closing ']'), or (None, len(pattern)) when git
+        would reject the whole pattern (unterminated set, unknown [:class:]).
+    """
+    n = len(pattern)
+    j = i + 1
+    negated = j < n and pattern[j] in "!^"
+    if negated:
+        j += 1
+    members: List[str] = []
+    prev: Optional[str] = None  # last single character, a possible range start
+    first = True
+    while j < n:
+        c = pattern[j]
+        if c == "]" and not first:
+            body = "".join(members)
+            if negated:
+                return f"[^/{body}]", j + 1
+            # like '?' and '*', a set never matches the path separator
+            cls = f"[{body}]"
+            return (cls if re.fullmatch(cls, "/") is None else f"(?!/){cls}"), j + 1
+        first = False
+        if c == "-" and prev is not None and j + 1 < n and pattern[j + 1] != "]":
+            j += 1
+            end = pattern[j]
+            if end == "\\":
+                j += 1
+                if j == n:
+                    break
+                end = pattern[j]
+            if prev <= end:
+                members.append(f"{re.escape(prev)}-{re.escape(end)}")
+            prev = None
+            j += 1
+            continue
+        if c == "\\":
+            j += 1
+            if j == n:
+                break
+            c = pattern[j]
+        elif pattern.startswith("[:", j):
+            close = pattern.find("]", j + 2)
+            if close == -1:
+                break
+            if close - 1 >= j + 2 and pattern[close - 1] == ":":
+                posix = POSIX_CLASSES.get(pattern[j + 2:close - 1])
+                if posix is None:
+                    break
+                members.append(posix)
+                prev = None
+                j = close + 1
+                continue
+        members.append(re.escape(c))
+        prev = c
+        j += 1
+    return None, n
+
+def gitignore_glob_to_regex(pattern: str) -> str:
+    """Translates one gitignore glob (without the leading '!' or trailing '/') to a regex for fullmatch."""
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    out = [] if anchored else ["(?:.*/)?"]
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                if pattern.startswith("**/", i):
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+                if i + 2 == n:
+                    out.append(".*")
+                    break
+            while i < n and pattern[i] == "*":
+                i += 1
+            out.append("[^/]*")
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            cls, i = gitignore_bracket_to_regex(pattern, i)
+            if cls is None:
+                return "(?!)"  # never matches, as in git
+            out.append(cls)
+            continue
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
         else:
-            lines.append("- Calls: None")
-        lines.append("")
-    # Optionally: index all functions per file/module
-    return "\n".join(lines)
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
 
-# ---------- Entry point ----------
+class GitIgnoreSpec:
+    r"""
+    .gitignore patterns compiled to regular expressions once, then matched against
+    root-relative, '/'-separated paths. One combined regex rejects the common case
+    (no pattern matches); otherwise rules are checked in order and the last match
+    wins, so '!' negations work.
 
-def find_python_files(root: str, ignore_dirs: Set[str]):
-    py_files = []
-    for dirpath, dirnames, filenames in os.walk(root):
-        dirnames[:] = [d for d in dirnames if d not in ignore_dirs]
-        for f in filenames:
-            if f.endswith(".py"):
-                py_files.append(os.path.join(dirpath, f))
-    return py_files
+    Each case below agrees with `git check-ignore` (run: python -m doctest generate_mapping.py):
 
-def load_ignore_dirs(root: str) -> Set[str]:
-    # Just directory names, not paths
-    ignore = {".git", "__pycache__"}
+    >>> cases = [  # (patterns, path, is_dir, ignored)
+    ...     (["*.py"],             "d/a.py",     False,  True),
+    ...     (["/a.py"],            "a.py",       False,  True),
+    ...     (["/a.py"],            "d/a.py",     False,  False),
+    ...     (["d/a.py"],           "x/d/a.py",   False,  False),
+    ...     (["build/"],           "x/build",    True,   True),
+    ...     (["build/"],           "build",      False,  False),
+    ...     (["**/foo"],           "a/b/foo",    False,  True),
+    ...     (["a/**/b"],           "a/b",        False,  True),
+    ...     (["a/**/b"],           "a/x/y/b",    False,  True),
+    ...     (["foo/**"],           "foo/x/y.py", False,  True),
+    ...     (["a*b"],              "a/b",        False,  False),
+    ...     (["a?.py"],            "a/.py",      False,  False),
+    ...     (["[!ab].py"],         "b.py",       False,  False),
+    ...     (["[!ab].py"],         "c.py",       False,  True),
+    ...     (["*.py", "!keep.py"], "keep.py",    False,  False),
+    ...     (["#x.py"],            "#x.py",      False,  False),
+    ...     (["\\#x.py"],          "#x.py",      False,  True),
+    ...     (["x.py   "],          "x.py",       False,  True),
+    ...     (["x\\ "],             "x ",         False,  True),
+    ...     (["x\\ "],             "x",          False,  False),
+    ...     (["[z-a].py"],         "z.py",       False,  True),
+    ...     (["[\\].py"],          "].py",       False,  False),
+    ...     (["[a-\\].py"],        "a.py",       False,  False),
+    ...     (["[\\d].py"],         "d.py",       False,  True),
+    ...     (["[\\d].py"],         "1.py",       False,  False),
+    ...     (["[[:digit:]].py"],   "1.py",       False,  True),
+    ...     (["[![:digit:]].py"],  "1.py",       False,  False),
+    ...     (["[[:foo:]].py"],     "f.py",       False,  False),
+    ...     (["[a&&b].py"],        "&.py",       False,  True),
+    ...     (["[a-c-e].py"],       "-.py",       False,  True),
+    ...     (["[!]].py"],          "].py",       False,  False),
+    ...     (["x[!a]y"],           "x/y",        False,  False),
+    ... ]
+    >>> [(patterns, path) for patterns, path, is_dir, ignored in cases
+    ...  if GitIgnoreSpec(patterns).match(path, is_dir) != ignored]
+    []
+    """
+    def __init__(self, lines: Iterable[str]) -> None:
+        self.rules: List[Tuple[re.Pattern[str], bool, bool]] = []  # (regex, negate, dir_only)
+        for line in lines:
+            line = line.rstrip("\n")
+            stripped = line.rstrip(" ")
+            # trailing spaces are dropped unless escaped: a final "\ " keeps its space
+            if stripped != line and (len(stripped) - len(stripped.rstrip("\\"))) % 2:
+                stripped += " "
+            line = stripped
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\#") or line.startswith("\\!"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line:
+                try:
+                    self.rules.append((re.compile(gitignore_glob_to_regex(line)), negate, dir_only))
+                except re.error as e:
+                    logging.warning(f"Skipping .gitignore pattern {line!r}: {e}")
+        self.any_rule = re.compile("|".join(f"(?:{regex.pattern})" for regex, _, _ in self.rules)) if self.rules else None
+
+    def match(self, rel_path: str, is_dir: bool) -> bool:
+        if self.any_rule is None or self.any_rule.fullmatch(rel_path) is None:
+            return False
+        ignored = False
+        for regex, negate, dir_only in self.rules:
+            if (is_dir or not dir_only) and regex.fullmatch(rel_path):
+                ignored = not negate
+        return ignored
+
+def load_ignore_spec(root: str) -> GitIgnoreSpec:
+    # .git and __pycache__ are always skipped, then the root .gitignore applies
+    lines = list(DEFAULT_IGNORE_PATTERNS)
     gitignore = os.path.join(root, ".gitignore")
     if os.path.exists(gitignore):
-        with open(gitignore) as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                name = line.rstrip("/").lstrip("*/")
-                if name:
-                    ignore.add(name)
-    return ignore
+        with open(gitignore, encoding="utf-8", errors="replace") as f:
+            lines.extend(f)
+    return GitIgnoreSpec(lines)
+
+# ---------- Entry point ----------
+
+def find_python_files(root: str, ignore: GitIgnoreSpec) -> List[str]:
+    """
+    Returns:
+        List of .py file paths, in the same order os.walk would visit them,
+        skipping anything matched by `ignore`.
+    """
+    py_files: List[str] = []
+
+    def walk(dirpath: str, rel_dir: str) -> None:
+        subdirs: List[Tuple[str, str]] = []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    rel_path = rel_dir + entry.name
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # like os.walk(followlinks=False): symlinked dirs are not entered
+                        if not entry.is_symlink() and not ignore.match(rel_path, True):
+                            subdirs.append((entry.path, rel_path + "/"))
+                    elif entry.name.endswith(".py") and not ignore.match(rel_path, False):
+                        py_files.append(entry.path)
+        except OSError:
+            return
+        for subdir, rel_subdir in subdirs:
+            walk(subdir, rel_subdir)
+
+    walk(root, "")
+    return py_files
 
-def main():
+def main() -> None:
     parser = argparse.ArgumentParser(description="Generate a function/call mapping for a Python project.")
     parser.add_argument("root", nargs="?", default=os.getcwd(), help="Project root (default: current directory)")
+    parser.add_argument("--no-cache", action="store_true", help=f"Do not read or write the cache in {CACHE_DIR}")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of parser processes (default: CPU count)")
     args = parser.parse_args()
     root = os.path.abspath(args.root)
-    ignore_dirs = load_ignore_dirs(root)
-    py_files = find_python_files(root, ignore_dirs)
+    ignore = load_ignore_spec(root)
+    py_files = find_python_files(root, ignore)
     logging.info(f"Found {len(py_files)} Python files")
-    all_functions, module_imports, symbol_imports = collect_functions_and_imports(py_files, root)
-    function_details = build_function_call_graph(py_files, root, all_functions, module_imports, symbol_imports)
-    md = write_markdown(root, function_details, all_functions)
-    with open(os.path.join(root, "mapping.md"), "w", encoding="utf-8") as f:
-        f.write(md)
+    file_to_module = {file_path: get_module_name(file_path, root) for file_path in py_files}
+    all_functions, function_details, module_imports, symbol_imports = collect_functions_and_imports(py_files, file_to_module, use_cache=not args.no_cache, jobs=args.jobs)
+    if not args.no_cache:
+        logging.info(f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    call_graph = iter_call_graph(file_to_module, all_functions, function_details, module_imports, symbol_imports)
+    write_markdown(root, function_details, call_graph, os.path.join(root, "mapping.md"))
     print("Wrote mapping.md")
 
 
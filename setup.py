@@ -1,9 +1,19 @@
+import os
 from setuptools import setup
 
+# Set PYMAP_MYPYC=1 to compile generate_mapping.py to a C extension with mypyc
+# (requires mypy, and `pip install --no-build-isolation` so the build can see
+# it); the default install stays pure Python.
+ext_modules = []
+if os.environ.get("PYMAP_MYPYC"):
+    from mypyc.build import mypycify
+    ext_modules = mypycify(['generate_mapping.py'])
+
 setup(
     name='pymap',
     version='0.1',
     py_modules=['generate_mapping'],
+    ext_modules=ext_modules,
     entry_points={
         'console_scripts': [
             'pymap = generate_mapping:main',